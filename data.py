@@ -1,50 +1,120 @@
 import os
+import logging
 import pydicom
 from pydicom.errors import InvalidDicomError
-from typing import Tuple, Dict, List
+from pydicom.dataset import FileDataset
+from typing import Tuple, Dict, List, Iterator, Optional, Set
 
+logger = logging.getLogger(__name__)
 
-def extract_dicom_info(patient_dir: str) -> Tuple[Dict, List[str]]:
+# Only the tags we actually read from the RTPlan, so pydicom can skip the rest
+RTPLAN_TAGS = ['StudyInstanceUID', 'SeriesInstanceUID', 'ManufacturerModelName', 'AccessoryCode', 'Modality']
+
+# Every tag used downstream from plans and structure sets, read in the walk's first pass
+DISCOVERY_TAGS = RTPLAN_TAGS + ['SOPInstanceUID']
+
+# RTDose headers are read in full once in the walk with PixelData deferred, so dose summation
+# reuses the dataset and only reads the pixel bytes for patients that are actually summed
+DOSE_DEFER_SIZE = "256 KB"
+
+# Column order of the metadata row returned by extract_dicom_info
+COLUMN_ORDER = [
+    'PatientID', 'StudyInstanceUID', 'SeriesInstanceUID', 'ManufacturersModelName', 'TreatmentSites',
+    'RTStruct_SOPInstanceUID', 'RTDose_SOPInstanceUIDs',
+]
+
+# Directories that never contain patient DICOM data
+SKIP_DIRS = {'__MACOSX', '__pycache__'}
+
+# Extensions that are never DICOM, skipped before the file is even opened
+SKIP_EXTS = {'.xlsx', '.xls', '.csv', '.png', '.jpg', '.jpeg', '.pdf', '.zip', '.xml', '.txt', '.log'}
+
+
+def _is_dicom(path: str) -> bool:
+    """Cheaply checks for the 'DICM' magic bytes after the 128-byte preamble."""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(128)
+            return f.read(4) == b'DICM'
+    except OSError:
+        return False
+
+
+def _walk_files(path: str) -> Iterator[str]:
+    """Recursively yields file paths under `path`, pruning hidden and known-irrelevant directories."""
+    try:
+        it = os.scandir(path)
+    except OSError:
+        # Like os.walk, skip directories we can't read instead of aborting the patient
+        return
+    with it:
+        for entry in it:
+            # Don't follow directory symlinks (as os.walk), but do yield symlinked files
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name.startswith('.') or entry.name in SKIP_DIRS:
+                    continue
+                yield from _walk_files(entry.path)
+            elif entry.is_file():
+                yield entry.path
+
+
+def _has_dicom_ext(filepath: str, dicom_exts: Optional[Set[str]]) -> bool:
+    """Filters by extension; files without one are kept since some vendors omit it."""
+    ext = os.path.splitext(filepath)[1].lower()
+    # UID-named files (e.g. 1.2.840.113619.2.55.3.1) end in an all-digit "extension"
+    if not ext or ext[1:].isdigit():
+        return True
+    if dicom_exts is not None:
+        return ext in dicom_exts
+    return ext not in SKIP_EXTS
+
+
+def extract_dicom_info(patient_dir: str,
+                       dicom_exts: Optional[Set[str]] = None) -> Tuple[Tuple, List[str], List[FileDataset]]:
     """
     Finds all DICOM files, extracts specified metadata for a spreadsheet,
     and returns the full list of file paths.
 
     Args:
         patient_dir (str): The path to the patient's main folder.
+        dicom_exts (set, optional): Lowercase extensions (e.g. {'.dcm'}) to restrict the search to.
+            Files without an extension are always considered. Default: skip only SKIP_EXTS.
 
     Returns:
         A tuple containing:
-        - dict: A dictionary with the extracted metadata.
+        - tuple: The extracted metadata, ordered as COLUMN_ORDER.
         - list: A list of full paths to ALL DICOM files found.
+        - list: The RTDose datasets found, with full headers and their PixelData deferred.
     """
     all_dicom_files = []
-    categorized_files = {'RTPLAN': [], 'RTSTRUCT': [], 'RTDOSE': []}
+    # Values are (filepath, parsed dataset) tuples so the datasets can be reused below
+    categorized_files: Dict[str, List[Tuple[str, FileDataset]]] = {'RTPLAN': [], 'RTSTRUCT': [], 'RTDOSE': []}
 
     # Find and categorize all DICOM files in one pass
-    for root, _, filenames in os.walk(patient_dir):
-        for filename in filenames:
-            filepath = os.path.join(root, filename)
-            try:
-                dcm = pydicom.dcmread(filepath, stop_before_pixels=True)
-                all_dicom_files.append(filepath)  # Add to the master list
-                modality = dcm.get("Modality", "").upper()
-                if modality in categorized_files:
-                    categorized_files[modality].append(filepath)
-            except (InvalidDicomError, AttributeError, IsADirectoryError):
-                continue
+    for filepath in _walk_files(patient_dir):
+        # Skip non-DICOM files without paying for a full parse
+        if not _has_dicom_ext(filepath, dicom_exts) or not _is_dicom(filepath):
+            continue
+        try:
+            dcm = pydicom.dcmread(filepath, stop_before_pixels=True, specific_tags=DISCOVERY_TAGS)
+            all_dicom_files.append(filepath)  # Add to the master list
+            modality = dcm.get("Modality", "").upper()
+            if modality == 'RTDOSE':
+                # Full header, but the pixel bytes are only read if the dose is summed
+                dcm = pydicom.dcmread(filepath, defer_size=DOSE_DEFER_SIZE)
+            if modality in categorized_files:
+                categorized_files[modality].append((filepath, dcm))
+        except (InvalidDicomError, AttributeError, IsADirectoryError):
+            continue
 
     patient_id = os.path.basename(os.path.normpath(patient_dir))
-    data = {
-        'PatientID': patient_id, 'StudyInstanceUID': 'N/A', 'SeriesInstanceUID': 'N/A',
-        'ManufacturersModelName': 'N/A', 'TreatmentSites': 'N/A',
-        'RTStruct_SOPInstanceUID': 'N/A', 'RTDose_SOPInstanceUIDs': 'N/A',
-    }
+    data = dict.fromkeys(COLUMN_ORDER, 'N/A')
+    data['PatientID'] = patient_id
 
     # Extract metadata from the categorized files
     if categorized_files['RTPLAN']:
-        plan_path = categorized_files['RTPLAN'][0]
+        _, plan_dcm = categorized_files['RTPLAN'][0]
         try:
-            plan_dcm = pydicom.dcmread(plan_path)
             data['StudyInstanceUID'] = plan_dcm.get("StudyInstanceUID", "N/A")
             data['SeriesInstanceUID'] = plan_dcm.get("SeriesInstanceUID", "N/A")
             data['ManufacturersModelName'] = plan_dcm.get("ManufacturerModelName", "N/A")
@@ -54,20 +124,19 @@ def extract_dicom_info(patient_dir: str) -> Tuple[Dict, List[str]]:
                                                                                            pydicom.multival.MultiValue) else str(
                     accessory_code)
         except Exception as e:
-            print(f"  -> Error processing RTPlan for {patient_id}: {e}")
+            logger.error(f"  -> Error processing RTPlan for {patient_id}: {e}")
 
     if categorized_files['RTSTRUCT']:
-        struct_path = categorized_files['RTSTRUCT'][0]
+        _, struct_dcm = categorized_files['RTSTRUCT'][0]
         try:
-            data['RTStruct_SOPInstanceUID'] = pydicom.dcmread(struct_path, stop_before_pixels=True).get(
-                "SOPInstanceUID", "N/A")
+            data['RTStruct_SOPInstanceUID'] = struct_dcm.get("SOPInstanceUID", "N/A")
         except Exception as e:
-            print(f"  -> Error processing RTStruct for {patient_id}: {e}")
+            logger.error(f"  -> Error processing RTStruct for {patient_id}: {e}")
 
     if categorized_files['RTDOSE']:
-        dose_uids = [pydicom.dcmread(p, stop_before_pixels=True).get("SOPInstanceUID", "N/A") for p in
-                     categorized_files['RTDOSE']]
+        dose_uids = [dcm.get("SOPInstanceUID", "N/A") for _, dcm in categorized_files['RTDOSE']]
         data['RTDose_SOPInstanceUIDs'] = ', '.join(filter(None, dose_uids))
 
     # Return the extracted data AND the complete list of all files
-    return data, all_dicom_files, categorized_files['RTDOSE']
\ No newline at end of file
+    row = tuple(data[column] for column in COLUMN_ORDER)
+    return row, all_dicom_files, [dcm for _, dcm in categorized_files['RTDOSE']]
\ No newline at end of file
@@ -1,7 +1,13 @@
 import os
+import logging
+import queue
+import threading
 import pydicom
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from tqdm import tqdm
 from pynetdicom import AE
+from pynetdicom.association import Association
 from pynetdicom.sop_class import (
     CTImageStorage,
     MRImageStorage,
@@ -10,21 +16,63 @@ from pynetdicom.sop_class import (
     RTStructureSetStorage
 )
 
-def send_patient_files(file_list: list, dest_ip: str, dest_port: int, dest_aet: str, calling_aet: str):
+logger = logging.getLogger(__name__)
+
+
+class AssociationPool:
     """
-    Sends a list of DICOM files to a specified destination using C-STORE.
+    Up to `size` associations to one destination, opened on first use and reused for the whole run.
+
+    Associations the remote end has dropped (e.g. on its idle timeout) are replaced the next
+    time they are needed.
+    """
+
+    def __init__(self, ae: AE, dest_ip: str, dest_port: int, dest_aet: str, size: int):
+        self.ae = ae
+        self.dest_ip = dest_ip
+        self.dest_port = dest_port
+        self.dest_aet = dest_aet
+        self.size = max(1, size)
+        self.associations = []
+        self.unsent_files = 0
+
+    def acquire(self, count: int) -> list:
+        """Returns up to `count` established associations, (re)associating as needed."""
+        count = min(count, self.size)
+        self.associations = [assoc for assoc in self.associations if assoc.is_established]
+        while len(self.associations) < count:
+            # max_pdu=0 lets the peer send PDUs of unlimited size
+            assoc = self.ae.associate(self.dest_ip, self.dest_port, ae_title=self.dest_aet, max_pdu=0)
+            if not assoc.is_established:
+                break
+            self.associations.append(assoc)
+        return self.associations[:count]
+
+    def release(self):
+        for assoc in self.associations:
+            if assoc.is_established:
+                assoc.release()
+        self.associations = []
+
+
+@contextmanager
+def dicom_sender(dest_ip: str, dest_port: int, dest_aet: str, calling_aet: str, num_associations: int = 4):
+    """
+    Provides a pool of associations to a DICOM destination that is reused for the whole run.
+
+    Reusing the associations avoids an A-ASSOCIATE/A-RELEASE round trip per
+    patient. They are opened on the first send and released when the context exits.
 
     Args:
-        file_list (list): A list of paths to the DICOM files to send.
         dest_ip (str): The IP address of the DICOM destination.
         dest_port (int): The port number of the DICOM destination.
         dest_aet (str): The Application Entity Title (AET) of the destination.
         calling_aet (str): The AET for this script.
-    """
-    if not file_list:
-        print(" -> No files to send.")
-        return
+        num_associations (int): The maximum number of concurrent associations. Default: 4.
 
+    Yields:
+        AssociationPool: The pool to pass to send_patient_files.
+    """
     # Set up our Application Entity
     ae = AE(ae_title=calling_aet)
 
@@ -40,26 +88,98 @@ def send_patient_files(file_list: list, dest_ip: str, dest_port: int, dest_aet:
     for sop_class in sop_classes:
         ae.add_requested_context(sop_class)
 
-    print(f"\nAttempting to send {len(file_list)} files to {dest_aet} at {dest_ip}:{dest_port}...")
+    logger.info(f"Sending to {dest_aet} at {dest_ip}:{dest_port} over up to {num_associations} association(s).")
+
+    pool = AssociationPool(ae, dest_ip, dest_port, dest_aet, num_associations)
+    try:
+        yield pool
+    finally:
+        pool.release()
+        if pool.unsent_files:
+            logger.warning(f" -> Send process finished with {pool.unsent_files} file(s) not sent. "
+                           f"Association(s) released.")
+        else:
+            logger.info(" -> Send process complete. Association(s) released.")
+
+
+def _prefetch_datasets(file_chunk: list, dataset_queue: queue.Queue):
+    """
+    Reads DICOM files in the background and puts (filepath, dataset, error) tuples on the queue.
+
+    A final None marks the end of the chunk.
+    """
+    for filepath in file_chunk:
+        try:
+            dataset_queue.put((filepath, pydicom.dcmread(filepath), None))
+        except Exception as e:
+            dataset_queue.put((filepath, None, e))
+    dataset_queue.put(None)
+
 
-    # Associate with the remote AE
-    assoc = ae.associate(dest_ip, dest_port, ae_title=dest_aet)
+def _send_chunk(assoc: Association, file_chunk: list, progress: tqdm) -> int:
+    """
+    Sends a chunk of DICOM files over an already established association.
+
+    Returns:
+        int: The number of files that could not be sent.
+    """
+    unsent = 0
+    # Decode the next files while the current one is on the wire
+    dataset_queue = queue.Queue(maxsize=4)
+    reader = threading.Thread(target=_prefetch_datasets, args=(file_chunk, dataset_queue), daemon=True)
+    reader.start()
 
-    if assoc.is_established:
-        print("Association successful.")
+    while (item := dataset_queue.get()) is not None:
+        filepath, dataset, error = item
+        try:
+            if error is not None:
+                raise error
+            status = assoc.send_c_store(dataset)
 
-        for filepath in tqdm(file_list, desc="Sending Files", unit="file", leave=False):
-            try:
-                dataset = pydicom.dcmread(filepath)
-                status = assoc.send_c_store(dataset)
+            if status and status.Status != 0x0000:
+                logger.error(f"Failed to send {os.path.basename(filepath)}. Status: 0x{status.Status:04x}")
+                unsent += 1
+            elif not status:
+                logger.error(f"Failed to send {os.path.basename(filepath)}: no response from the destination.")
+                unsent += 1
 
-                if status and status.Status != 0x0000:
-                    tqdm.write(f"Failed to send {os.path.basename(filepath)}. Status: 0x{status.Status:04x}")
+        except Exception as e:
+            logger.error(f"Could not read or send {filepath}: {e}")
+            unsent += 1
+
+        progress.update(1)
+
+    reader.join()
+    return unsent
+
+
+def send_patient_files(file_list: list, pool: AssociationPool):
+    """
+    Sends a list of DICOM files to a specified destination using C-STORE.
+
+    The files are split across the pool's associations so that the network
+    round trip of one C-STORE overlaps with the others.
+
+    Args:
+        file_list (list): A list of paths to the DICOM files to send.
+        pool (AssociationPool): The association pool yielded by dicom_sender.
+    """
+    if not file_list:
+        logger.info(" -> No files to send.")
+        return
+
+    # Never use more associations than there are files to send
+    associations = pool.acquire(len(file_list))
+    if not associations:
+        logger.warning(f" -> Association with {pool.dest_aet} at {pool.dest_ip}:{pool.dest_port} failed, "
+                       f"{len(file_list)} file(s) not sent. Please check IP, port, and AET.")
+        pool.unsent_files += len(file_list)
+        return
 
-            except Exception as e:
-                tqdm.write(f"Could not read or send {filepath}: {e}")
+    num_chunks = len(associations)
+    file_chunks = [file_list[i::num_chunks] for i in range(num_chunks)]
 
-        assoc.release()
-        print(" -> Send process complete. Association released.")
-    else:
-        print("Association with the destination failed. Please check IP, port, and AET.")
\ No newline at end of file
+    with tqdm(total=len(file_list), desc="Sending Files", unit="file", leave=False) as progress:
+        with ThreadPoolExecutor(max_workers=num_chunks) as executor:
+            pool.unsent_files += sum(executor.map(lambda assoc, chunk: _send_chunk(assoc, chunk, progress),
+                                                  associations, file_chunks))
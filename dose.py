@@ -2,15 +2,67 @@
 # sum sequential dose cubes of a treatment course for further use in proknow
 
 import os
+import logging
+import tempfile
 import numpy as np
 import pydicom
 from pydicom.uid import generate_uid
 from datetime import datetime
-from copy import deepcopy
+from copy import copy, deepcopy
 
+try:
+    # Optional: fuses the scale, round and cast into a single pass. It is compiled without
+    # parallel=True since patients already run in one worker process per core.
+    from numba import njit
+except ImportError:
+    njit = None
 
-def load_dose_grid(filepath):
-    ds = pydicom.dcmread(filepath)
+logger = logging.getLogger(__name__)
+
+# Number of frames processed at a time when streaming through the summed dose grid
+SLAB_SIZE = 32
+
+
+def _slabs(num_frames):
+    for z0 in range(0, num_frames, SLAB_SIZE):
+        yield slice(z0, min(z0 + SLAB_SIZE, num_frames))
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _scale_to_uint16_kernel(src, scale, out):
+        for i in range(src.size):
+            out[i] = np.uint16(np.rint(src[i] * scale))
+
+
+def _scale_to_uint16(src, scale, out):
+    """Writes rint(src * scale) into the uint16 array `out`, overwriting `src` when NumPy is used."""
+    if njit is not None:
+        _scale_to_uint16_kernel(src.reshape(-1), np.float32(scale), out.reshape(-1))
+    else:
+        np.multiply(src, scale, out=src)
+        np.rint(src, out=src)
+        out[:] = src
+
+
+def _dose_path(dose):
+    return dose.filename if isinstance(dose, pydicom.dataset.Dataset) else dose
+
+
+def load_dose_grid(dose, out=None):
+    """
+    Loads an RTDose grid in Gy as float32.
+
+    `dose` is a path or a dataset holding PixelData (e.g. from extract_dicom_info, where it is
+    deferred), which is used without re-parsing. Either way the returned dataset's pixel data
+    is released once the grid is extracted, so a dataset passed in is modified.
+    """
+    filepath = _dose_path(dose)
+    if isinstance(dose, pydicom.dataset.Dataset) and 'PixelData' in dose:
+        ds = dose
+    else:
+        # Defer the large PixelData value so it is only read when the pixels are decoded
+        ds = pydicom.dcmread(filepath, defer_size="256 KB")
     if not isinstance(ds, pydicom.dataset.FileDataset):
         raise TypeError(f"Expected a pydicom.dataset.FileDataset, but got {type(ds)} for {filepath}")
     if ds.Modality != 'RTDOSE':
@@ -18,31 +70,52 @@ def load_dose_grid(filepath):
     if not hasattr(ds, 'pixel_array') or not hasattr(ds, 'DoseGridScaling'):
         raise ValueError(f"Missing required DICOM attributes in {filepath}")
 
-    dose_grid = ds.pixel_array.astype(np.float32) * float(ds.DoseGridScaling)
+    # Scale straight into a caller-provided float32 buffer when it fits, else allocate one
+    raw = ds.pixel_array
+    if out is not None and out.shape == raw.shape:
+        dose_grid = np.multiply(raw, np.float32(ds.DoseGridScaling), out=out)
+    else:
+        dose_grid = raw.astype(np.float32, copy=False)
+        dose_grid *= float(ds.DoseGridScaling)
+    del raw
+
+    # The pixels now live in dose_grid; drop the raw bytes and pydicom's cached array so
+    # only the lightweight header is kept (the element stays so its VR survives save_as)
+    ds.PixelData = b""
+    ds._pixel_array = None
     return dose_grid, ds
 
 
-def check_same_geometry(datasets):
-    ref = datasets[0]
-    for i, ds in enumerate(datasets[1:], 1):
-        if (
-                ds.Rows != ref.Rows or
-                ds.Columns != ref.Columns or
-                ds.NumberOfFrames != ref.NumberOfFrames or
-                ds.PixelSpacing != ref.PixelSpacing or
-                ds.ImageOrientationPatient != ref.ImageOrientationPatient or
-                ds.ImagePositionPatient != ref.ImagePositionPatient or
-                ds.GridFrameOffsetVector != ref.GridFrameOffsetVector
-        ):
-            raise ValueError(f"Geometry mismatch in dose file {i + 1} ({ds.filename}).")
-
-
-def sum_doses(dose_arrays):
-    return np.sum(dose_arrays, axis=0)
-
-
-def create_new_dose_dataset(reference_ds, summed_dose_array, patient_id):
-    new_ds = deepcopy(reference_ds)
+def _geom_key(ds):
+    # Plain tuples compare element-wise in C instead of through MultiValue.__ne__
+    return (
+        ds.Rows,
+        ds.Columns,
+        ds.NumberOfFrames,
+        tuple(ds.PixelSpacing),
+        tuple(ds.ImageOrientationPatient),
+        tuple(ds.ImagePositionPatient),
+        tuple(ds.GridFrameOffsetVector),
+    )
+
+
+def _copy_dose_dataset(reference_ds):
+    # Copy only the top-level elements; nested sequences are shared with the reference since
+    # we never modify them, which avoids deep-cloning every element of large RTDose headers
+    new_ds = pydicom.dataset.FileDataset(
+        reference_ds.filename, {},
+        file_meta=deepcopy(reference_ds.file_meta),
+        preamble=reference_ds.preamble,
+        is_implicit_VR=reference_ds.is_implicit_VR,
+        is_little_endian=reference_ds.is_little_endian,
+    )
+    for elem in reference_ds:
+        new_ds.add(copy(elem))
+    return new_ds
+
+
+def create_new_dose_dataset(reference_ds, summed_dose_array, patient_id, max_val=None):
+    new_ds = _copy_dose_dataset(reference_ds)
 
     # Update required UIDs and description
     new_ds.SOPInstanceUID = generate_uid()
@@ -51,12 +124,18 @@ def create_new_dose_dataset(reference_ds, summed_dose_array, patient_id):
     new_ds.ContentDate = datetime.now().strftime("%Y%m%d")
     new_ds.ContentTime = datetime.now().strftime("%H%M%S")
 
-    max_val = np.max(summed_dose_array)
+    num_frames = summed_dose_array.shape[0]
+    if max_val is None:
+        max_val = max(summed_dose_array[z].max() for z in _slabs(num_frames))
     if max_val == 0:
         raise ValueError("Summed dose grid is all zeros. Cannot scale.")
 
-    # Use uint32 for better precision if needed, but uint16 is common
-    scaled_array = (summed_dose_array / max_val * np.iinfo(np.uint16).max).astype(np.uint16)
+    # Use uint32 for better precision if needed, but uint16 is common.
+    # Scale slab by slab in place; the summed array (possibly a memmap) is ours to overwrite.
+    scale = np.iinfo(np.uint16).max / max_val
+    scaled_array = np.empty(summed_dose_array.shape, dtype=np.uint16)
+    for z in _slabs(num_frames):
+        _scale_to_uint16(summed_dose_array[z], scale, scaled_array[z])
     new_ds.DoseGridScaling = max_val / np.iinfo(np.uint16).max
 
     new_ds.PixelData = scaled_array.tobytes()
@@ -69,49 +148,83 @@ def create_new_dose_dataset(reference_ds, summed_dose_array, patient_id):
 
 
 def perform_summation(rtdose_files: list, patient_id: str):
+    """
+    Sums the RTDose files of a patient and saves the result next to the first file.
+
+    Args:
+        rtdose_files (list): The patient's RTDose files, as paths or datasets with PixelData
+            (as returned by extract_dicom_info).
+        patient_id (str): The patient ID, used in messages and the output filename.
+
+    Returns:
+        str: The path of the new summed dose file, or None if summation was skipped or failed.
+    """
     if len(rtdose_files) <= 1:
         # This check is technically redundant as main.py already does it, but it's good practice.
-        return
+        return None
 
     # Use the directory of the first dose file as the output location
-    output_dir = os.path.dirname(rtdose_files[0])
+    output_dir = os.path.dirname(_dose_path(rtdose_files[0]))
 
     # Check if a summed file already exists in the folder
     if any("summed" in f.lower() for f in os.listdir(output_dir)):
-        print(f" -> Summed dose already exists for patient {patient_id}, skipping.")
-        return
-
-    print(f"\nPerforming dose summation for patient: {patient_id}")
-    dose_arrays = []
-    datasets = []
+        logger.info(f" -> Summed dose already exists for patient {patient_id}, skipping.")
+        return None
+
+    logger.info(f"Performing dose summation for patient: {patient_id}")
+    summed_array = None
+    reference_ds = None
+
+    # The accumulator is a disk-backed memmap so memory stays bounded for very large grids
+    with tempfile.TemporaryFile() as accumulator_file:
+        logger.info(f" -> Checking geometry and summing {len(rtdose_files)} dose files...")
+        max_val = None
+        load_buffer = None
+        for i, dose_file in enumerate(rtdose_files):
+            is_last = i == len(rtdose_files) - 1
+            try:
+                dose_grid, ds = load_dose_grid(dose_file, out=load_buffer)
+            except Exception as e:
+                logger.error(f"  -> ERROR: Could not load {os.path.basename(_dose_path(dose_file))}: {e}")
+                return None  # Stop summation for this patient if a file is invalid
+
+            # Compare each file against the first one's precomputed geometry key
+            try:
+                if reference_ds is None:
+                    reference_ds, reference_key = ds, _geom_key(ds)
+                elif _geom_key(ds) != reference_key:
+                    raise ValueError(f"Geometry mismatch in dose file {i + 1} ({ds.filename}).")
+            except Exception as e:
+                logger.error(f"  -> ERROR: Failed to sum doses for patient {patient_id}: {e}")
+                return None
+
+            if summed_array is None:
+                summed_array = np.memmap(accumulator_file, dtype=np.float32, mode='w+', shape=dose_grid.shape)
+                summed_array[:] = dose_grid
+            else:
+                # Accumulate slab by slab so the working set stays cache- and page-friendly.
+                # On the last file, take the max while each finished slab is still hot.
+                for z in _slabs(dose_grid.shape[0]):
+                    summed_array[z] += dose_grid[z]
+                    if is_last:
+                        slab_max = summed_array[z].max()
+                        max_val = slab_max if max_val is None else max(max_val, slab_max)
+
+            # Reuse this grid's allocation for the next file instead of allocating a new one
+            load_buffer = dose_grid
+            del dose_grid
+        del load_buffer
 
-    for file_path in rtdose_files:
         try:
-            dose_array, ds = load_dose_grid(file_path)
-            dose_arrays.append(dose_array)
-            datasets.append(ds)
-        except Exception as e:
-            print(f"  -> ERROR: Could not load {os.path.basename(file_path)}: {e}")
-            return  # Stop summation for this patient if a file is invalid
-
-    if not datasets:
-        print(f"  -> ERROR: No valid RTDOSE files could be loaded for patient {patient_id}.")
-        return
-
-    try:
-        print(f" -> Checking geometry for {len(datasets)} dose files...")
-        check_same_geometry(datasets)
+            logger.info(" -> Creating new DICOM dataset for summed dose...")
+            new_ds, filename = create_new_dose_dataset(reference_ds, summed_array, patient_id, max_val)
+            del summed_array
 
-        print(" -> Summing dose grids...")
-        summed_array = sum_doses(dose_arrays)
+            out_path = os.path.join(output_dir, filename)
+            new_ds.save_as(out_path)
+            logger.info(f" Summed dose saved to: {out_path}")
+            return out_path
 
-        print(" -> Creating new DICOM dataset for summed dose...")
-        new_ds, filename = create_new_dose_dataset(datasets[0], summed_array, patient_id)
-
-        out_path = os.path.join(output_dir, filename)
-        new_ds.save_as(out_path)
-        print(f" Summed dose saved to: {out_path}")
-
-    except Exception as e:
-        print(f"  -> ERROR: Failed to sum doses for patient {patient_id}: {e}")
-        return None
\ No newline at end of file
+        except Exception as e:
+            logger.error(f"  -> ERROR: Failed to sum doses for patient {patient_id}: {e}")
+            return None
\ No newline at end of file
@@ -1,55 +1,162 @@
 # main.py
 
 import os
+import sys
 import argparse
+import logging
+import logging.handlers
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
 import pandas as pd
 from tqdm import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
 
 from dose import perform_summation
-from data import extract_dicom_info
-from dicom_send import send_patient_files  # <-- IMPORT THE NEW FUNCTION
+from data import extract_dicom_info, COLUMN_ORDER
+from dicom_send import dicom_sender, send_patient_files
+
+logger = logging.getLogger(__name__)
+
+
+def configure_logging(verbose):
+    """Routes progress messages through logging; they are only shown with --verbose."""
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING, format="%(message)s")
+    # pynetdicom logs every association event at INFO, which would drown out our own messages
+    logging.getLogger("pynetdicom").setLevel(logging.WARNING)
+
+
+def _configure_worker_logging(log_queue, verbose):
+    """Sends a worker's log records to the parent, which prints them without breaking the tqdm bars."""
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(logging.INFO if verbose else logging.WARNING)
+    logging.getLogger("pynetdicom").setLevel(logging.WARNING)
+
+
+class _ParentLogHandler(logging.Handler):
+    """Re-emits records received from worker processes through the parent's own loggers."""
+
+    def emit(self, record):
+        logging.getLogger(record.name).handle(record)
+
+
+def _process_one(patient_dir, args):
+    """
+    Extracts metadata and performs dose summation for a single patient.
+
+    Runs in a worker process, so it must stay a module-level function. A patient that
+    fails is logged and gets an 'N/A' row and no files to send.
+
+    Returns:
+        A tuple containing:
+        - tuple: The extracted metadata for the patient, ordered as COLUMN_ORDER.
+        - list: A list of full paths to ALL DICOM files to send, including any new summed dose.
+    """
+    patient_id = os.path.basename(patient_dir)
+    logger.info(f"--- Processing Patient: {patient_id} ---")
+
+    try:
+        # 1. Get metadata, the list of ALL dicom files, and the parsed RTDose datasets
+        patient_data, all_files, rtdose_datasets = extract_dicom_info(patient_dir, args.dicom_ext)
+
+        # 2. Perform dose summation if applicable
+        if len(rtdose_datasets) > 1:
+            summed_dose_path = perform_summation(rtdose_datasets, patient_id)
+            # If a new file was created, add it to the list of files to be sent
+            if summed_dose_path:
+                all_files.append(summed_dose_path)
+    except Exception as e:
+        # An exception here would be re-raised by executor.map and abort every other patient
+        logger.error(f"  -> ERROR: Failed to process patient {patient_id}: {e}")
+        patient_data = tuple(patient_id if column == 'PatientID' else 'N/A' for column in COLUMN_ORDER)
+        all_files = []
+
+    return patient_data, all_files
+
+
+def save_summary(all_patient_data, output_path, output_format):
+    """
+    Writes the collected patient metadata to an Excel or CSV file.
+
+    Args:
+        all_patient_data (list): A list of metadata rows ordered as COLUMN_ORDER, one per patient.
+        output_path (str): The path of the output file.
+        output_format (str): Either 'xlsx' or 'csv'.
+    """
+    # Rows are already aligned to COLUMN_ORDER, so skip per-row dict inference
+    df = pd.DataFrame.from_records(all_patient_data, columns=COLUMN_ORDER)
+
+    if output_format == 'csv':
+        df.to_csv(output_path, index=False)
+    else:
+        # xlsxwriter is faster than openpyxl. Its constant_memory mode can't be used because
+        # pandas writes column by column and that mode drops writes to already flushed rows.
+        with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
+            df.to_excel(writer, index=False)
+
+    print(f"\nSummary of {len(df)} patients saved to: {output_path}")
 
 
 def process_patient_directories(args):
-    """Main function to orchestrate DICOM processing tasks."""
+    """
+    Main function to orchestrate DICOM processing tasks.
+
+    Returns:
+        int: The number of files that could not be sent (0 when not sending).
+    """
     try:
         patient_dirs = [d.path for d in os.scandir(args.root_dir) if d.is_dir()]
     except FileNotFoundError:
         print(f"Error: Root directory not found at '{args.root_dir}'")
-        return
+        return 0
 
     if not patient_dirs:
         print(f"No patient directories found in '{args.root_dir}'.")
-        return
+        return 0
 
     print(f"Found {len(patient_dirs)} patient directories. Starting processing...")
 
     all_patient_data = []
 
-    for patient_dir in tqdm(patient_dirs, desc="Processing Patients", unit="patient"):
-        patient_id = os.path.basename(patient_dir)
-        tqdm.write(f"\n--- Processing Patient: {patient_id} ---")
-
-        # 1. Get metadata, the list of ALL dicom files, and the list of RTDose files
-        patient_data, all_files, rtdose_files = extract_dicom_info(patient_dir)
-        all_patient_data.append(patient_data)
-
-        # 2. Perform dose summation if applicable
-        if len(rtdose_files) > 1:
-            summed_dose_path = perform_summation(rtdose_files, patient_id)
-            # If a new file was created, add it to the list of files to be sent
-            if summed_dose_path:
-                all_files.append(summed_dose_path)
-
-        # 3. If the send flag is set, send ALL collected files
-        if args.send:
-            send_patient_files(
-                file_list=all_files,
-                dest_ip=args.dest_ip,
-                dest_port=args.dest_port,
-                dest_aet=args.dest_aet,
-                calling_aet=args.calling_aet
-            )
+    # Worker log records are forwarded here and, like our own, written around the tqdm bars
+    log_queue = multiprocessing.Queue()
+    log_listener = logging.handlers.QueueListener(log_queue, _ParentLogHandler())
+
+    with logging_redirect_tqdm():
+        log_listener.start()
+        try:
+            # Patients are independent, so scan, extract and sum them on all cores at once.
+            # map() starts the workers right away, before the sender creates any threads or sockets.
+            with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=_configure_worker_logging,
+                                     initargs=(log_queue, args.verbose)) as executor:
+                results = executor.map(partial(_process_one, args=args), patient_dirs)
+
+                # Reuse the same associations for every patient
+                sender = dicom_sender(
+                    dest_ip=args.dest_ip,
+                    dest_port=args.dest_port,
+                    dest_aet=args.dest_aet,
+                    calling_aet=args.calling_aet,
+                    num_associations=args.associations
+                ) if args.send else nullcontext()
+
+                with sender as pool:
+                    for patient_data, all_files in tqdm(results, total=len(patient_dirs),
+                                                        desc="Processing Patients", unit="patient"):
+                        all_patient_data.append(patient_data)
+
+                        # 3. If the send flag is set, send ALL collected files (network-bound, kept in the parent)
+                        if args.send:
+                            send_patient_files(file_list=all_files, pool=pool)
+        finally:
+            # Workers have exited by now, so this drains every record they sent
+            log_listener.stop()
+
+    save_summary(all_patient_data, args.output, args.format)
+
+    return pool.unsent_files if args.send else 0
 
 
 if __name__ == '__main__':
@@ -58,8 +165,15 @@ if __name__ == '__main__':
     )
     # Existing arguments
     parser.add_argument("root_dir", type=str, help="The root directory containing patient folders.")
-    parser.add_argument("-o", "--output", type=str, default="dicom_summary.xlsx",
-                        help="Path for the output Excel file.")
+    parser.add_argument("-o", "--output", type=str,
+                        help="Path for the output summary file. Default: dicom_summary.<format>")
+    parser.add_argument("--format", type=str, choices=["xlsx", "csv"], default="xlsx",
+                        help="Format of the output summary file. Default: xlsx")
+    parser.add_argument("--dicom-ext", type=str, nargs="+",
+                        help="Only consider files with these extensions (e.g. .dcm). "
+                             "Files without an extension are always considered.")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="Show per-patient progress messages.")
 
     # Arguments for DICOM sending
     parser.add_argument("--send", action="store_true",
@@ -68,6 +182,8 @@ if __name__ == '__main__':
     parser.add_argument("--dest-port", type=int, help="Destination port number.")
     parser.add_argument("--dest-aet", type=str, help="Destination Application Entity Title (AET).")
     parser.add_argument("--calling-aet", type=str, default="PY_SENDER", help="This script's AET. Default: PY_SENDER")
+    parser.add_argument("--associations", type=int, default=4,
+                        help="Number of concurrent associations used to send files. Default: 4")
 
     args = parser.parse_args()
 
@@ -75,5 +191,16 @@ if __name__ == '__main__':
     if args.send and not all([args.dest_ip, args.dest_port, args.dest_aet]):
         parser.error("--send requires --dest-ip, --dest-port, and --dest-aet to be set.")
 
+    if args.output is None:
+        args.output = f"dicom_summary.{args.format}"
+    elif os.path.splitext(args.output)[1].lower() != f".{args.format}":
+        parser.error(f"--output must end in .{args.format} when --format is {args.format}.")
+
+    if args.dicom_ext:
+        args.dicom_ext = {ext.lower() if ext.startswith('.') else f".{ext.lower()}" for ext in args.dicom_ext}
+
+    configure_logging(args.verbose)
+
     # This is the corrected function call
-    process_patient_directories(args)
\ No newline at end of file
+    if process_patient_directories(args):
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.uid import generate_uid, ExplicitVRLittleEndian, RTDoseStorage, RTPlanStorage, RTStructureSetStorage
+
+SOP_CLASSES = {'RTDOSE': RTDoseStorage, 'RTPLAN': RTPlanStorage, 'RTSTRUCT': RTStructureSetStorage}
+
+
+def write_dicom(path, modality, dose=None, scaling=0.01, **attrs):
+    """Writes a minimal synthetic DICOM file and returns its SOPInstanceUID."""
+    file_meta = FileMetaDataset()
+    file_meta.MediaStorageSOPClassUID = SOP_CLASSES[modality]
+    file_meta.MediaStorageSOPInstanceUID = generate_uid()
+    file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    ds = FileDataset(str(path), {}, file_meta=file_meta, preamble=b"\0" * 128)
+    ds.is_little_endian = True
+    ds.is_implicit_VR = False
+    ds.SOPClassUID = file_meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = file_meta.MediaStorageSOPInstanceUID
+    ds.Modality = modality
+    ds.PatientID = "TEST"
+    ds.StudyInstanceUID = "1.2.3"
+    ds.SeriesInstanceUID = generate_uid()
+
+    if dose is not None:
+        ds.NumberOfFrames, ds.Rows, ds.Columns = dose.shape
+        ds.SamplesPerPixel = 1
+        ds.PhotometricInterpretation = "MONOCHROME2"
+        ds.BitsAllocated = 16
+        ds.BitsStored = 16
+        ds.HighBit = 15
+        ds.PixelRepresentation = 0
+        ds.PixelSpacing = [2.5, 2.5]
+        ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+        ds.ImagePositionPatient = [0, 0, 0]
+        ds.GridFrameOffsetVector = [2.5 * z for z in range(dose.shape[0])]
+        ds.DoseGridScaling = scaling
+        ds.PixelData = dose.astype(np.uint16).tobytes()
+
+    for keyword, value in attrs.items():
+        setattr(ds, keyword, value)
+
+    ds.save_as(str(path), write_like_original=False)
+    return ds.SOPInstanceUID
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
@@ -0,0 +1,65 @@
+import os
+
+from conftest import write_dicom
+from data import COLUMN_ORDER, extract_dicom_info
+
+
+def test_extract_dicom_info(tmp_path, rng):
+    patient_dir = tmp_path / "PAT1"
+    (patient_dir / "plan").mkdir(parents=True)
+    (patient_dir / "dose").mkdir()
+    write_dicom(patient_dir / "plan" / "RP.dcm", "RTPLAN", ManufacturerModelName="TPS", AccessoryCode=["Head", "Neck"])
+    struct_uid = write_dicom(patient_dir / "plan" / "RS.dcm", "RTSTRUCT")
+    dose_uids = {write_dicom(patient_dir / "dose" / f"RD{i}.dcm", "RTDOSE", rng.integers(0, 100, (4, 5, 6)))
+                 for i in range(2)}
+    (patient_dir / "notes.txt").write_text("not dicom")
+    (patient_dir / "garbage.dcm").write_bytes(b"\0" * 256)
+
+    row, all_files, rtdose = extract_dicom_info(str(patient_dir))
+    data = dict(zip(COLUMN_ORDER, row))
+
+    assert data['PatientID'] == "PAT1"
+    assert data['StudyInstanceUID'] == "1.2.3"
+    assert data['ManufacturersModelName'] == "TPS"
+    assert data['TreatmentSites'] == "Head, Neck"
+    assert data['RTStruct_SOPInstanceUID'] == struct_uid
+    assert set(data['RTDose_SOPInstanceUIDs'].split(', ')) == dose_uids
+    assert len(all_files) == 4
+    assert len(rtdose) == 2
+
+
+def test_extract_dicom_info_walk(tmp_path, rng, monkeypatch):
+    patient_dir = tmp_path / "PAT1"
+    (patient_dir / "__MACOSX").mkdir(parents=True)
+    (patient_dir / "locked").mkdir()
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    write_dicom(elsewhere / "RP.dcm", "RTPLAN")
+    write_dicom(patient_dir / "__MACOSX" / "RP.dcm", "RTPLAN")
+    (patient_dir / "link.dcm").symlink_to(elsewhere / "RP.dcm")
+
+    real_scandir = os.scandir
+
+    def scandir(path):
+        if os.path.basename(path) == "locked":
+            raise PermissionError(path)
+        return real_scandir(path)
+
+    monkeypatch.setattr(os, "scandir", scandir)
+
+    _, all_files, _ = extract_dicom_info(str(patient_dir))
+
+    # Symlinked files are followed, pruned and unreadable directories are skipped
+    assert all_files == [str(patient_dir / "link.dcm")]
+
+
+def test_extract_dicom_info_dicom_exts(tmp_path):
+    patient_dir = tmp_path / "PAT1"
+    patient_dir.mkdir()
+    for name in ["RP.dcm", "RP.IMA", "RP", "1.2.840.113619.2.55.3.1"]:
+        write_dicom(patient_dir / name, "RTPLAN")
+
+    _, all_files, _ = extract_dicom_info(str(patient_dir), {'.dcm'})
+
+    # Extensionless and UID-named files are always considered
+    assert sorted(os.path.basename(f) for f in all_files) == ["1.2.840.113619.2.55.3.1", "RP", "RP.dcm"]
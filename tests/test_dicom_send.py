@@ -0,0 +1,65 @@
+import socket
+import time
+
+import numpy as np
+import pytest
+from pynetdicom import AE, AllStoragePresentationContexts, evt
+
+from conftest import write_dicom
+from dicom_send import dicom_sender, send_patient_files
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def storage_scp():
+    """A local Storage SCP that drops idle associations after 0.2 s and records stored SOPInstanceUIDs."""
+    stored = []
+
+    def handle_store(event):
+        stored.append(event.request.AffectedSOPInstanceUID)
+        return 0x0000
+
+    ae = AE()
+    ae.supported_contexts = AllStoragePresentationContexts
+    ae.network_timeout = 0.2
+    port = _free_port()
+    server = ae.start_server(('127.0.0.1', port), block=False, evt_handlers=[(evt.EVT_C_STORE, handle_store)])
+    yield port, stored
+    server.shutdown()
+
+
+def _write_files(tmp_path, count):
+    paths = [tmp_path / f"RD{i}.dcm" for i in range(count)]
+    for path in paths:
+        write_dicom(path, "RTDOSE", np.ones((2, 3, 4)))
+    return [str(path) for path in paths]
+
+
+def test_send_reassociates_after_idle_drop(tmp_path, storage_scp):
+    port, stored = storage_scp
+    files = _write_files(tmp_path, 4)
+
+    with dicom_sender('127.0.0.1', port, 'ANY', 'PY_SENDER', num_associations=2) as pool:
+        send_patient_files(files[:2], pool)
+        # Let the SCP drop the idle associations before the next patient
+        time.sleep(0.6)
+        assert not any(assoc.is_established for assoc in pool.associations)
+        send_patient_files(files[2:], pool)
+
+    assert len(stored) == 4
+    assert pool.unsent_files == 0
+
+
+def test_send_reports_unsent_files(tmp_path, caplog):
+    files = _write_files(tmp_path, 2)
+
+    with dicom_sender('127.0.0.1', _free_port(), 'ANY', 'PY_SENDER') as pool:
+        send_patient_files(files, pool)
+
+    assert pool.unsent_files == 2
+    assert any(record.levelname == "WARNING" and "not sent" in record.message for record in caplog.records)
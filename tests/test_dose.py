@@ -0,0 +1,80 @@
+import numpy as np
+import pydicom
+
+from conftest import write_dicom
+from data import extract_dicom_info
+from dose import perform_summation
+
+
+def test_perform_summation_matches_reference(tmp_path, rng):
+    # More frames than SLAB_SIZE so the slab loops cross a boundary
+    shape = (40, 6, 7)
+    raw = [rng.integers(0, 1000, shape) for _ in range(3)]
+    scalings = [0.01, 0.02, 0.005]
+    paths = []
+    for i, (dose, scaling) in enumerate(zip(raw, scalings)):
+        paths.append(str(tmp_path / f"RD{i}.dcm"))
+        write_dicom(paths[-1], "RTDOSE", dose, scaling)
+
+    out_path = perform_summation(paths, "PAT1")
+
+    summed = pydicom.dcmread(out_path)
+    got = summed.pixel_array * float(summed.DoseGridScaling)
+    expected = sum(dose * scaling for dose, scaling in zip(raw, scalings))
+    assert summed.pixel_array.shape == shape
+    # Quantising to uint16 loses at most half a step
+    assert np.abs(got - expected).max() <= float(summed.DoseGridScaling) / 2 + 1e-6
+    assert summed.SeriesDescription == "Summed Dose"
+
+
+def test_perform_summation_geometry_mismatch(tmp_path, rng):
+    write_dicom(tmp_path / "RD0.dcm", "RTDOSE", rng.integers(0, 100, (4, 5, 6)))
+    write_dicom(tmp_path / "RD1.dcm", "RTDOSE", rng.integers(0, 100, (4, 5, 7)))
+
+    assert perform_summation([str(tmp_path / "RD0.dcm"), str(tmp_path / "RD1.dcm")], "PAT1") is None
+    assert not any("Summed" in p.name for p in tmp_path.iterdir())
+
+
+def test_perform_summation_from_discovery_datasets(tmp_path, rng, monkeypatch):
+    # Large enough (> DOSE_DEFER_SIZE) for PixelData to be deferred
+    raw = [rng.integers(0, 1000, (10, 100, 150)) for _ in range(2)]
+    for i, dose in enumerate(raw):
+        write_dicom(tmp_path / f"RD{i}.dcm", "RTDOSE", dose)
+
+    deferred_reads = []
+    read_deferred_data_element = pydicom.filereader.read_deferred_data_element
+
+    def count_deferred_reads(*args, **kwargs):
+        deferred_reads.append(args)
+        return read_deferred_data_element(*args, **kwargs)
+
+    def no_reparse(*args, **kwargs):
+        raise AssertionError("RTDose file parsed a second time")
+
+    monkeypatch.setattr(pydicom.filereader, "read_deferred_data_element", count_deferred_reads)
+
+    # The walk keeps full RTDose headers, but doesn't read the pixel bytes yet
+    _, _, rtdose = extract_dicom_info(str(tmp_path))
+    assert not deferred_reads
+
+    # Summation reads only the deferred pixel bytes, without parsing the files again
+    monkeypatch.setattr(pydicom, "dcmread", no_reparse)
+    out_path = perform_summation(rtdose, "PAT1")
+    monkeypatch.undo()
+    assert len(deferred_reads) == 2
+
+    summed = pydicom.dcmread(out_path)
+    expected = sum(dose * 0.01 for dose in raw)
+    assert np.abs(summed.pixel_array * float(summed.DoseGridScaling) - expected).max() <= float(
+        summed.DoseGridScaling) / 2 + 1e-6
+
+
+def test_perform_summation_missing_geometry_tag(tmp_path, rng):
+    write_dicom(tmp_path / "RD0.dcm", "RTDOSE", rng.integers(0, 100, (4, 5, 6)))
+    write_dicom(tmp_path / "RD1.dcm", "RTDOSE", rng.integers(0, 100, (4, 5, 6)))
+    ds = pydicom.dcmread(tmp_path / "RD1.dcm")
+    del ds.GridFrameOffsetVector
+    ds.save_as(tmp_path / "RD1.dcm")
+
+    assert perform_summation([str(tmp_path / "RD0.dcm"), str(tmp_path / "RD1.dcm")], "PAT1") is None
+    assert not any("Summed" in p.name for p in tmp_path.iterdir())
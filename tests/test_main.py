@@ -0,0 +1,76 @@
+import argparse
+import multiprocessing
+
+import pandas as pd
+import pydicom
+import pytest
+
+import main
+from conftest import write_dicom
+from data import COLUMN_ORDER
+from main import process_patient_directories, save_summary
+
+ROWS = [
+    ("PAT1", "1.2.3", "1.2.3.4", "TPS", "Head, Neck", "1.2.3.5", "1.2.3.6, 1.2.3.7"),
+    ("PAT2", "N/A", "N/A", "N/A", "N/A", "N/A", "1.2.3.8"),
+]
+
+
+def test_save_summary_csv(tmp_path):
+    out_path = tmp_path / "summary.csv"
+    save_summary(ROWS, str(out_path), 'csv')
+
+    df = pd.read_csv(out_path, dtype=str, keep_default_na=False)
+    assert list(df.columns) == COLUMN_ORDER
+    assert [tuple(row) for row in df.itertuples(index=False)] == ROWS
+
+
+def test_save_summary_xlsx_keeps_every_cell(tmp_path):
+    pytest.importorskip("openpyxl")
+    out_path = tmp_path / "summary.xlsx"
+    save_summary(ROWS, str(out_path), 'xlsx')
+
+    df = pd.read_excel(out_path, dtype=str, keep_default_na=False)
+    assert list(df.columns) == COLUMN_ORDER
+    assert [tuple(row) for row in df.itertuples(index=False)] == ROWS
+
+
+def _args(root_dir, output):
+    return argparse.Namespace(root_dir=str(root_dir), output=str(output), format='csv', dicom_ext=None,
+                              verbose=False, send=False)
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason="the crashing patient is injected by monkeypatching, which only fork workers inherit")
+def test_process_patient_directories(tmp_path, rng, monkeypatch):
+    root = tmp_path / "root"
+    for patient_id in ["PAT1", "PAT2", "CRASH"]:
+        (root / patient_id).mkdir(parents=True)
+    write_dicom(root / "PAT1" / "RP.dcm", "RTPLAN", ManufacturerModelName="TPS")
+    for i in range(2):
+        write_dicom(root / "PAT1" / f"RD{i}.dcm", "RTDOSE", rng.integers(0, 100, (4, 5, 6)))
+        write_dicom(root / "PAT2" / f"RD{i}.dcm", "RTDOSE", rng.integers(0, 100, (4, 5, 6)))
+    # PAT2's second dose file can't be summed, which must only skip its summation
+    ds = pydicom.dcmread(root / "PAT2" / "RD1.dcm")
+    del ds.GridFrameOffsetVector
+    ds.save_as(root / "PAT2" / "RD1.dcm")
+
+    extract_dicom_info = main.extract_dicom_info
+
+    def crash_on_patient(patient_dir, dicom_exts=None):
+        if patient_dir.endswith("CRASH"):
+            raise RuntimeError("unexpected failure")
+        return extract_dicom_info(patient_dir, dicom_exts)
+
+    monkeypatch.setattr(main, "extract_dicom_info", crash_on_patient)
+
+    out_path = tmp_path / "summary.csv"
+    assert process_patient_directories(_args(root, out_path)) == 0
+
+    df = pd.read_csv(out_path, dtype=str, keep_default_na=False).set_index('PatientID')
+    assert sorted(df.index) == ["CRASH", "PAT1", "PAT2"]
+    assert df.loc["PAT1", 'ManufacturersModelName'] == "TPS"
+    assert len(df.loc["PAT2", 'RTDose_SOPInstanceUIDs'].split(', ')) == 2
+    assert set(df.loc["CRASH"]) == {"N/A"}
+    assert any("Summed" in p.name for p in (root / "PAT1").iterdir())
+    assert not any("Summed" in p.name for p in (root / "PAT2").iterdir())